@@ -1,43 +1,41 @@
 import click
+import json
 import logging
 from plat_manager import EC2Manager
-import json
 from s3_manager import S3Manager
 from route53_manager import Route53Manager
-import os
+from log_setup import LOG_LEVELS, setup_logging
+from config_loader import CONFIG_ENV_VAR, get_config, load_config
+from journal import get_journal
 
 
-# Configure logging
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
-    handlers=[
-        logging.StreamHandler()
-    ]
-)
 logger = logging.getLogger(__name__)
 
-# Load configuration
-# Load configuration
-config_path = 'var/lib/jenkins/workspace/pip/platform-engineering'
-print(f"Absolute path to config.json: {os.path.abspath(config_path)}")
-
-with open(config_path) as config_file:
-    config = json.load(config_file)
-
-default_ami = config.get('default_ami', 'ubuntu')
-default_subnet_id = config.get('default_subnet_id', None)
-instance_types = config.get('instance_types', [])
-default_region = config.get('default_region', 'us-east-1')
 default_instance_name = "Rachel's_instance"
-username = config.get('username', 'default_user')
-username_tag_key = config.get('username_tag_key', 'CreatedByCLIUser')
+
+# Journaled manager methods that `resume` is allowed to replay, per service.
+RESUMABLE_ACTIONS = {
+    'ec2': {'create_instance', 'start_instance', 'stop_instance'},
+    's3': {'create_bucket', 'upload_file'},
+    'route53': {'create_zone', 'create_record', 'update_record', 'delete_record'},
+}
 
 
 @click.group()
-def cli():
+@click.option('--config', 'config_path', type=click.Path(dir_okay=False), envvar=CONFIG_ENV_VAR,
+              help='Path to config.json (default: the one next to this CLI).')
+@click.option('--log-level', type=click.Choice(LOG_LEVELS, case_sensitive=False), default='INFO',
+              help='Minimum level of log records to emit.')
+@click.option('--quiet', is_flag=True, help='Only emit errors.')
+@click.option('--json-logs', is_flag=True, help='Emit log records as JSON lines.')
+@click.option('--aws-debug', is_flag=True, help='Also emit boto3/botocore records below WARNING.')
+def cli(config_path, log_level, quiet, json_logs, aws_debug):
     """AWS CLI Tool"""
-    pass
+    setup_logging(level=log_level, quiet=quiet, json_format=json_logs, aws_debug=aws_debug)
+    try:
+        load_config(config_path)
+    except (OSError, ValueError) as e:
+        raise click.ClickException(f'Invalid configuration: {e}')
 
 
 # EC2 Commands
@@ -49,30 +47,33 @@ def ec2():
 
 @ec2.command()
 @click.option('--type', prompt='Instance type', help='Type of EC2 instance.')
-@click.option('--ami', default=default_ami, help='AMI ID for the EC2 instance (default: from config).')
-@click.option('--subnet', default=default_subnet_id, help='Subnet ID for the EC2 instance (default: from config).')
+@click.option('--ami', default=lambda: get_config().default_ami,
+              help='AMI ID for the EC2 instance (default: from config).')
+@click.option('--subnet', default=lambda: get_config().default_subnet_id,
+              help='Subnet ID for the EC2 instance (default: from config).')
 @click.option('--name', default=default_instance_name, help='Name for the EC2 instance (default: Rachel\'s_instance).')
 def create(type, ami, subnet, name):
     """Create a new EC2 instance"""
-    ec2_manager = EC2Manager(region=default_region)
+    config = get_config()
+    ec2_manager = EC2Manager(region=config.default_region)
 
     # Validate instance type
-    if type not in instance_types:
-        logger.error(f"Invalid instance type: {type}")
+    if type not in config.instance_types:
+        logger.error("Invalid instance type: %s", type)
         click.echo(f"Invalid instance type: {type}")
         return
 
     # Validate AMI ID
-    ami_id = config['ami_ids'].get(ami, ami) if ami in config['ami_ids'] else ami
+    ami_id = config.resolve_ami(ami)
 
-    if ami_id not in config['ami_ids'].values():
-        logger.error(f"Invalid AMI ID: {ami_id}")
+    if ami_id not in config.valid_ami_ids:
+        logger.error("Invalid AMI ID: %s", ami_id)
         click.echo(f"Invalid AMI ID: {ami_id}")
         return
 
     instance_id = ec2_manager.create_instance(type, ami_id, subnet, name)
     if instance_id:
-        logger.info(f'Created instance {instance_id}')
+        logger.info('Created instance %s', instance_id)
         click.echo(f'Created instance {instance_id}')
     else:
         logger.error('Failed to create instance.')
@@ -83,7 +84,7 @@ def create(type, ami, subnet, name):
 @click.option('--instance-id', help='ID of the EC2 instance.')
 def start(name, instance_id):
     """Start an EC2 instance"""
-    ec2_manager = EC2Manager(region=default_region)
+    ec2_manager = EC2Manager(region=get_config().default_region)
     ec2_manager.start_instance(name=name, instance_id=instance_id)
 
 
@@ -92,14 +93,14 @@ def start(name, instance_id):
 @click.option('--instance-id', help='ID of the EC2 instance.')
 def stop(name, instance_id):
     """Stop an EC2 instance"""
-    ec2_manager = EC2Manager(region=default_region)
+    ec2_manager = EC2Manager(region=get_config().default_region)
     ec2_manager.stop_instance(name=name, instance_id=instance_id)
 
 
 @ec2.command()
 def list_instances():
     """List EC2 instances"""
-    ec2_manager = EC2Manager(region=default_region)
+    ec2_manager = EC2Manager(region=get_config().default_region)
     instances = ec2_manager.list_instances()
     for instance in instances:
         click.echo(f"ID: {instance['ID']}, Name: {instance['Name']}")
@@ -116,14 +117,14 @@ def s3():
 @click.option('--public/--private', default=False, help='Specify if the bucket should be public or private.')
 def create(name, public):
     """Create a new S3 bucket"""
-    s3_manager = S3Manager(region=default_region)
+    s3_manager = S3Manager(region=get_config().default_region)
 
     # Prompt for username
-    user = click.prompt('Your name', default=username, type=str)
+    user = click.prompt('Your name', default=get_config().username, type=str)
 
     bucket_name = s3_manager.create_bucket(name, public, user)
     if bucket_name:
-        logger.info(f'Bucket created: {bucket_name}')
+        logger.info('Bucket created: %s', bucket_name)
         click.echo(f'Bucket created: {bucket_name}')
     else:
         logger.error('Failed to create bucket.')
@@ -135,7 +136,7 @@ def create(name, public):
 @click.option('--file', prompt='Path to the file', help='Path to the file to upload.')
 def upload(bucket, file):
     """Upload a file to an S3 bucket"""
-    s3_manager = S3Manager(region=default_region)
+    s3_manager = S3Manager(region=get_config().default_region)
     success = s3_manager.upload_file(bucket, file)
     if success:
         click.echo(f'Uploaded file {file} to bucket {bucket}')
@@ -146,7 +147,7 @@ def upload(bucket, file):
 @s3.command()
 def list():
     """List S3 buckets"""
-    s3_manager = S3Manager(region=default_region)
+    s3_manager = S3Manager(region=get_config().default_region)
     buckets = s3_manager.list_buckets()
     if buckets:
         click.echo("Buckets created by you:")
@@ -156,9 +157,105 @@ def list():
         click.echo("No buckets found or no buckets created by you.")
 
 
-@click.group()
-def cli():
-    """CLI for managing AWS services."""
+def _format_size(num_bytes):
+    size = float(num_bytes)
+    for unit in ['B', 'KiB', 'MiB', 'GiB']:
+        if size < 1024:
+            return f'{size:.1f} {unit}'
+        size /= 1024
+    return f'{size:.1f} TiB'
+
+
+def _format_usage_row(bucket_usage):
+    if bucket_usage.error:
+        return f'{bucket_usage.bucket:<40} error: {bucket_usage.error}'
+    objects = f'{bucket_usage.objects}{"+" if bucket_usage.truncated else ""}'
+    classes = ', '.join(f"{name}={_format_size(stats['bytes'])}"
+                        for name, stats in sorted(bucket_usage.storage_classes.items()))
+    prefixes = ', '.join(f"{p['prefix']}={_format_size(p['bytes'])}" for p in bucket_usage.largest_prefixes)
+    return f'{bucket_usage.bucket:<40} {objects:>10} {_format_size(bucket_usage.total_bytes):>12}  {classes}  {prefixes}'
+
+
+@s3.command()
+@click.option('--format', 'output_format', type=click.Choice(['table', 'ndjson']), default='table',
+              help='Output as a table or one JSON object per bucket.')
+@click.option('--workers', type=click.IntRange(min=1), default=8, show_default=True,
+              help='Number of buckets listed in parallel.')
+@click.option('--time-budget', type=click.FloatRange(min=0), default=60, show_default=True,
+              help='Seconds to spend listing each bucket; 0 means no limit.')
+@click.option('--top-prefixes', type=click.IntRange(min=0), default=3, show_default=True,
+              help='Number of largest top-level prefixes to show per bucket.')
+def usage(output_format, workers, time_budget, top_prefixes):
+    """Report storage usage of S3 buckets created by you
+
+    Object counts ending in '+' are partial: the bucket's listing hit the time budget.
+    """
+    s3_manager = S3Manager(region=get_config().default_region)
+    buckets = s3_manager.list_buckets(workers=workers)
+    if not buckets:
+        click.echo("No buckets found or no buckets created by you.")
+        return
+
+    if output_format == 'table':
+        click.echo(f"{'BUCKET':<40} {'OBJECTS':>10} {'SIZE':>12}  STORAGE CLASSES  LARGEST PREFIXES")
+    for bucket_usage in s3_manager.usage_report(buckets, workers=workers, time_budget=time_budget,
+                                                top_prefixes=top_prefixes):
+        if output_format == 'ndjson':
+            click.echo(json.dumps(bucket_usage.to_dict()))
+        else:
+            click.echo(_format_usage_row(bucket_usage))
+
+
+def _manager_for(service, region):
+    region = region or get_config().default_region
+    if service == 'ec2':
+        return EC2Manager(region=region)
+    if service == 's3':
+        return S3Manager(region=region)
+    return Route53Manager()
+
+
+@cli.command()
+@click.option('--max-attempts', type=int, default=3, show_default=True,
+              help='Skip operations that have already failed transiently this many times.')
+@click.option('--dry-run', is_flag=True, help='Only show the unfinished operations.')
+def resume(max_attempts, dry_run):
+    """Replay unfinished operations from the journal"""
+    journal = get_journal()
+    pending = journal.pending()
+    if not pending:
+        click.echo('Nothing to resume.')
+        return
+
+    managers = {}
+    for op in pending:
+        label = f"{op['service']} {op['action']} {op['params']}"
+        if op['action'] not in RESUMABLE_ACTIONS.get(op['service'], ()):
+            click.echo(f'Skipping unknown operation {label}')
+            continue
+        if op['attempts'] >= max_attempts:
+            click.echo(f"Skipping {label}: failed {op['attempts']} times, last error: {op.get('error')}")
+            continue
+        if dry_run:
+            click.echo(f'Pending {label}')
+            continue
+
+        manager_key = (op['service'], op.get('region'))
+        click.echo(f'Resuming {label}')
+        try:
+            if manager_key not in managers:
+                managers[manager_key] = _manager_for(*manager_key)
+            getattr(managers[manager_key], op['action'])(**op['params'], op_key=op['key'])
+        except Exception as e:
+            logger.error('Error resuming %s: %s', label, e)
+            click.echo(f'Error resuming {label}: {e}')
+            # Errors the managers did not journal themselves (e.g. BotoCoreError) still count as attempts.
+            if not journal.has_outcome(op['key']):
+                journal.fail(op['key'], e)
+
+    if not dry_run:
+        remaining = journal.compact()
+        click.echo(f'{remaining} operation(s) still unfinished.')
 
 
 if __name__ == '__main__':
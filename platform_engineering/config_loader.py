@@ -1,13 +1,178 @@
+import hashlib
 import json
+import logging
 import os
+from dataclasses import dataclass
+from types import MappingProxyType
 
+logger = logging.getLogger(__name__)
 
-def load_config(filename='config.json'):
-    if not os.path.exists(filename):
-        raise FileNotFoundError(f"{filename} not found.")
+CONFIG_ENV_VAR = 'PLATFORM_CONFIG'
+CACHE_DIR_ENV_VAR = 'PLATFORM_CONFIG_CACHE_DIR'
+DEFAULT_CONFIG_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'config.json')
 
-    with open(filename, 'r') as file:
-        return json.load(file)
+# Bump when the schema or the cached payload layout changes to invalidate old caches.
+CACHE_VERSION = 3
 
+# key -> (expected type, required, default)
+SCHEMA = {
+    'ami_ids': (dict, True, None),
+    'instance_types': (list, True, None),
+    'username': (str, True, None),
+    'default_ami': (str, False, 'ubuntu'),
+    'default_subnet_id': (str, False, None),
+    'default_vpc_id': (str, False, None),
+    'max_running_instances': (int, False, 2),
+    'username_tag_key': (str, False, 'CreatedByCLIUser'),
+    'default_region': (str, False, 'us-east-1'),
+    'journal_path': (str, False, 'operations_journal.jsonl'),
+}
 
-config = load_config()
+_active = None
+
+
+@dataclass(frozen=True)
+class ConfigSnapshot:
+    """Validated, read-only view of config.json with precomputed lookup sets."""
+    path: str
+    ami_ids: MappingProxyType
+    instance_types: frozenset
+    valid_ami_ids: frozenset
+    username: str
+    default_ami: str
+    default_subnet_id: str
+    default_vpc_id: str
+    max_running_instances: int
+    username_tag_key: str
+    default_region: str
+    journal_path: str
+
+    def resolve_ami(self, ami):
+        """Map an AMI alias such as 'ubuntu' to its ID; unknown values pass through."""
+        return self.ami_ids.get(ami, ami)
+
+
+def resolve_config_path(path=None):
+    """Pick the config file: explicit path, then $PLATFORM_CONFIG, then the bundled config.json."""
+    return os.path.abspath(path or os.environ.get(CONFIG_ENV_VAR) or DEFAULT_CONFIG_PATH)
+
+
+def validate_config(data):
+    """Check ``data`` against SCHEMA and return a copy with defaults filled in."""
+    if not isinstance(data, dict):
+        raise ValueError('Config must be a JSON object.')
+
+    validated = {}
+    for key, (expected_type, required, default) in SCHEMA.items():
+        if key not in data or data[key] is None:
+            if required:
+                raise ValueError(f"Config is missing required key '{key}'.")
+            validated[key] = default
+            continue
+        value = data[key]
+        # bool is an int subclass; reject it where a count is expected.
+        if not isinstance(value, expected_type) or (expected_type is int and isinstance(value, bool)):
+            raise ValueError(f"Config key '{key}' must be of type {expected_type.__name__}.")
+        validated[key] = value
+
+    if not all(isinstance(k, str) and isinstance(v, str) for k, v in validated['ami_ids'].items()):
+        raise ValueError("Config key 'ami_ids' must map names to AMI ID strings.")
+    if not all(isinstance(t, str) for t in validated['instance_types']):
+        raise ValueError("Config key 'instance_types' must be a list of strings.")
+    if validated['default_ami'] not in validated['ami_ids'] and \
+            validated['default_ami'] not in validated['ami_ids'].values():
+        raise ValueError(f"Config default_ami '{validated['default_ami']}' is not listed in 'ami_ids'.")
+    return validated
+
+
+def compile_config(path, validated):
+    ami_ids = dict(validated['ami_ids'])
+    return ConfigSnapshot(
+        path=path,
+        ami_ids=MappingProxyType(ami_ids),
+        instance_types=frozenset(validated['instance_types']),
+        valid_ami_ids=frozenset(ami_ids.values()),
+        username=validated['username'],
+        default_ami=validated['default_ami'],
+        default_subnet_id=validated['default_subnet_id'],
+        default_vpc_id=validated['default_vpc_id'],
+        max_running_instances=validated['max_running_instances'],
+        username_tag_key=validated['username_tag_key'],
+        default_region=validated['default_region'],
+        # A relative journal_path lives next to the config file, not in whatever directory the CLI runs from.
+        journal_path=os.path.join(os.path.dirname(path), os.path.expanduser(validated['journal_path'])),
+    )
+
+
+def _cache_file(path):
+    cache_dir = os.environ.get(CACHE_DIR_ENV_VAR) or os.path.join(
+        os.environ.get('XDG_CACHE_HOME') or os.path.expanduser('~/.cache'), 'platform-engineering')
+    digest = hashlib.sha1(path.encode('utf-8')).hexdigest()[:16]
+    return os.path.join(cache_dir, f'config-{digest}.json')
+
+
+def _read_cache(cache_file, key):
+    """Return the cached validated config, or None if it is missing, stale or unreadable."""
+    try:
+        with open(cache_file, 'r') as f:
+            cached = json.load(f)
+    except (OSError, ValueError):
+        return None
+    if not isinstance(cached, dict) or cached.get('key') != list(key):
+        return None
+    config = cached.get('config')
+    return config if isinstance(config, dict) else None
+
+
+def _write_cache(cache_file, key, validated):
+    tmp_file = f'{cache_file}.{os.getpid()}.tmp'
+    try:
+        os.makedirs(os.path.dirname(cache_file), exist_ok=True)
+        with open(tmp_file, 'w') as f:
+            json.dump({'key': list(key), 'config': validated}, f)
+        os.replace(tmp_file, cache_file)
+    except OSError as e:
+        logger.debug('Could not write config cache %s: %s', cache_file, e)
+
+
+def load_config(filename=None):
+    """Load, validate and compile the config file, and make it the active snapshot.
+
+    The validated config is cached on disk as JSON, keyed by the file's path,
+    mtime and size, so an unchanged file is read back from the cache without
+    being validated again. A cache that cannot be used falls back to config.json.
+    """
+    global _active
+    path = resolve_config_path(filename)
+    if not os.path.exists(path):
+        raise FileNotFoundError(f"{path} not found.")
+
+    stat = os.stat(path)
+    key = (CACHE_VERSION, path, stat.st_mtime_ns, stat.st_size)
+    if _active is not None and _active[0] == key:
+        return _active[1]
+
+    cache_file = _cache_file(path)
+    snapshot = None
+    validated = _read_cache(cache_file, key)
+    if validated is not None:
+        try:
+            snapshot = compile_config(path, validated)
+        except (KeyError, TypeError, AttributeError, ValueError) as e:
+            logger.debug('Ignoring malformed config cache %s: %s', cache_file, e)
+    if snapshot is None:
+        logger.debug('Parsing config %s', path)
+        with open(path, 'r') as file:
+            validated = validate_config(json.load(file))
+        _write_cache(cache_file, key, validated)
+        snapshot = compile_config(path, validated)
+
+    _active = (key, snapshot)
+    return snapshot
+
+
+def get_config():
+    """Return the active config snapshot, loading the default one on first use."""
+    if _active is not None:
+        return _active[1]
+    return load_config()
@@ -0,0 +1,217 @@
+import json
+import logging
+import os
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+
+from boto3.exceptions import S3UploadFailedError
+from botocore.exceptions import BotoCoreError, ClientError
+
+from config_loader import get_config
+
+logger = logging.getLogger(__name__)
+
+JOURNAL_ENV_VAR = 'PLATFORM_JOURNAL'
+
+INTENT = 'intent'
+COMPLETED = 'completed'
+FAILED = 'failed'
+REJECTED = 'rejected'
+
+# ClientError codes that mean "try again later" rather than "AWS said no".
+TRANSIENT_ERROR_CODES = {
+    'Throttling', 'ThrottlingException', 'ThrottledException', 'RequestThrottled', 'RequestThrottledException',
+    'TooManyRequestsException', 'RequestLimitExceeded', 'SlowDown', 'PriorRequestNotComplete',
+    'RequestTimeout', 'RequestTimeoutException', 'InternalError', 'InternalFailure', 'ServiceUnavailable',
+}
+
+# Once the journal grows past this size, finished operations are compacted away.
+COMPACT_THRESHOLD_BYTES = 1024 * 1024
+
+_journal = None
+
+
+def _lock_file(f):
+    if fcntl is not None:
+        fcntl.flock(f.fileno(), fcntl.LOCK_EX)
+    else:
+        f.seek(0)
+        msvcrt.locking(f.fileno(), msvcrt.LK_LOCK, 1)
+
+
+def _unlock_file(f):
+    if fcntl is not None:
+        fcntl.flock(f.fileno(), fcntl.LOCK_UN)
+    else:
+        f.seek(0)
+        msvcrt.locking(f.fileno(), msvcrt.LK_UNLCK, 1)
+
+
+def is_transient(error):
+    """Tell whether ``error`` may succeed on retry (throttling, 5xx, transport errors)."""
+    if isinstance(error, (BotoCoreError, S3UploadFailedError)):
+        return True
+    if isinstance(error, ClientError):
+        code = error.response.get('Error', {}).get('Code')
+        status = error.response.get('ResponseMetadata', {}).get('HTTPStatusCode') or 0
+        return code in TRANSIENT_ERROR_CODES or status >= 500
+    return False
+
+
+def new_key():
+    """Return a fresh idempotency key, also usable as a CallerReference/ClientToken."""
+    return str(uuid.uuid4())
+
+
+class Journal:
+    """Append-only, fsync'd log of intended and finished AWS operations.
+
+    Each line is one JSON event. A crash can at worst leave a torn final line,
+    which is skipped on replay. Writers in every process serialise on an
+    advisory lock on ``<path>.lock``, so compaction never drops their events.
+    """
+
+    def __init__(self, path, compact_threshold=COMPACT_THRESHOLD_BYTES):
+        self.path = os.path.abspath(path)
+        self._lock = threading.Lock()
+        self._compact_threshold = compact_threshold
+        self._compact_at = compact_threshold
+        self._settled = set()  # keys this process has recorded an outcome for
+
+    @contextmanager
+    def _locked(self):
+        with self._lock, open(f'{self.path}.lock', 'a') as lock_file:
+            _lock_file(lock_file)
+            try:
+                yield
+            finally:
+                _unlock_file(lock_file)
+
+    def _terminate_torn_line(self):
+        """Make sure new events do not get glued onto a line torn by a crash."""
+        try:
+            with open(self.path, 'rb') as f:
+                f.seek(0, os.SEEK_END)
+                if f.tell() == 0:
+                    return
+                f.seek(-1, os.SEEK_END)
+                torn = f.read(1) != b'\n'
+        except FileNotFoundError:
+            return
+        if torn:
+            with open(self.path, 'a') as f:
+                f.write('\n')
+
+    def _append(self, event):
+        event['ts'] = time.time()
+        line = json.dumps(event) + '\n'
+        with self._locked():
+            self._terminate_torn_line()
+            with open(self.path, 'a') as f:
+                f.write(line)
+                f.flush()
+                os.fsync(f.fileno())
+                size = f.tell()
+            if size >= self._compact_at:
+                self._compact()
+                # Back off while most of the journal is still pending, so compaction stays amortised.
+                self._compact_at = max(self._compact_threshold, 2 * os.path.getsize(self.path))
+
+    def intend(self, service, action, params, key=None, region=None):
+        """Record that ``action`` is about to run and return its idempotency key.
+
+        Passing an existing ``key`` (as resume does) re-uses it instead of
+        recording a second intent.
+        """
+        if key is not None:
+            return key
+        key = new_key()
+        self._append({'event': INTENT, 'key': key, 'service': service, 'action': action,
+                      'region': region, 'params': params})
+        return key
+
+    def complete(self, key, result=None):
+        self._append({'event': COMPLETED, 'key': key, 'result': result})
+        self._settled.add(key)
+
+    def fail(self, key, error):
+        """Record a failed attempt.
+
+        Transient errors keep the operation pending so ``resume`` retries it.
+        Anything else is a definitive refusal: the operation is recorded as
+        rejected and never replayed.
+        """
+        event = FAILED if is_transient(error) else REJECTED
+        self._append({'event': event, 'key': key, 'error': str(error)})
+        self._settled.add(key)
+
+    def has_outcome(self, key):
+        """Tell whether this process already recorded how ``key`` ended."""
+        return key in self._settled
+
+    def _events(self):
+        if not os.path.exists(self.path):
+            return
+        with open(self.path) as f:
+            for line in f:
+                try:
+                    yield json.loads(line)
+                except ValueError:
+                    logger.warning('Skipping unreadable journal line in %s', self.path)
+
+    def pending(self):
+        """Return unfinished intents in the order they were recorded.
+
+        Completed and rejected operations are dropped. Each remaining intent
+        carries an ``attempts`` count of the transient failures logged for it.
+        """
+        intents = {}
+        for event in self._events():
+            key = event.get('key')
+            if event.get('event') == INTENT:
+                intents[key] = dict(event, attempts=0)
+            elif key in intents:
+                if event['event'] in (COMPLETED, REJECTED):
+                    del intents[key]
+                elif event['event'] == FAILED:
+                    intents[key]['attempts'] += 1
+                    intents[key]['error'] = event.get('error')
+        return list(intents.values())
+
+    def compact(self):
+        """Rewrite the journal so it holds only unfinished intents and their failures."""
+        with self._locked():
+            return self._compact()
+
+    def _compact(self):
+        pending = self.pending()
+        tmp_path = f'{self.path}.tmp'
+        with open(tmp_path, 'w') as f:
+            for intent in pending:
+                attempts = intent.pop('attempts')
+                error = intent.pop('error', None)
+                f.write(json.dumps(intent) + '\n')
+                for _ in range(attempts):
+                    f.write(json.dumps({'event': FAILED, 'key': intent['key'], 'error': error,
+                                        'ts': intent['ts']}) + '\n')
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, self.path)
+        logger.debug('Compacted journal %s to %s pending operation(s)', self.path, len(pending))
+        return len(pending)
+
+
+def get_journal():
+    """Return the process-wide journal at $PLATFORM_JOURNAL or the configured journal_path."""
+    global _journal
+    if _journal is None:
+        _journal = Journal(os.environ.get(JOURNAL_ENV_VAR) or get_config().journal_path)
+    return _journal
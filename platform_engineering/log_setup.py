@@ -0,0 +1,100 @@
+import atexit
+import copy
+import json
+import logging
+import logging.handlers
+import queue
+import sys
+import time
+from contextlib import contextmanager
+
+LOG_LEVELS = ['DEBUG', 'INFO', 'WARNING', 'ERROR', 'CRITICAL']
+TEXT_FORMAT = '%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+# AWS SDK loggers that stay at WARNING unless explicitly requested, since their DEBUG output is huge.
+AWS_LOGGERS = ['boto3', 'botocore', 's3transfer', 'urllib3']
+
+_listener = None
+
+
+class JsonFormatter(logging.Formatter):
+    """Render each record as one JSON object per line."""
+
+    def format(self, record):
+        payload = {
+            'time': self.formatTime(record),
+            'level': record.levelname,
+            'logger': record.name,
+            'message': record.getMessage(),
+        }
+        duration_ms = getattr(record, 'duration_ms', None)
+        if duration_ms is not None:
+            payload['duration_ms'] = duration_ms
+        if record.exc_info and not record.exc_text:
+            record.exc_text = self.formatException(record.exc_info)
+        if record.exc_text:
+            payload['exc_info'] = record.exc_text
+        return json.dumps(payload)
+
+
+class _RenderingQueueHandler(logging.handlers.QueueHandler):
+    """Render the message and traceback text before queuing, keeping them apart."""
+
+    def prepare(self, record):
+        record = copy.copy(record)
+        record.message = record.getMessage()
+        if record.exc_info and not record.exc_text:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+        record.msg = record.message
+        record.args = None
+        record.exc_info = None
+        return record
+
+
+def setup_logging(level='INFO', quiet=False, json_format=False, aws_debug=False):
+    """Route all logging through a queue drained by a background writer thread.
+
+    Messages are rendered before they are queued, so later changes to their
+    arguments do not leak into the output; only the stream I/O is deferred.
+    Safe to call more than once; only the first call installs handlers.
+    """
+    global _listener
+    if _listener is not None:
+        return
+
+    stream_handler = logging.StreamHandler(sys.stderr)
+    stream_handler.setFormatter(JsonFormatter() if json_format else logging.Formatter(TEXT_FORMAT))
+
+    log_queue = queue.SimpleQueue()
+    root = logging.getLogger()
+    for handler in list(root.handlers):
+        root.removeHandler(handler)
+    root.addHandler(_RenderingQueueHandler(log_queue))
+    root.setLevel(logging.ERROR if quiet else level.upper())
+    if not aws_debug:
+        for name in AWS_LOGGERS:
+            logging.getLogger(name).setLevel(logging.WARNING)
+
+    _listener = logging.handlers.QueueListener(log_queue, stream_handler)
+    _listener.start()
+    atexit.register(shutdown_logging)
+
+
+def shutdown_logging():
+    """Flush pending records and stop the writer thread."""
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
+
+
+@contextmanager
+def log_timing(logger, msg, *args, level=logging.INFO):
+    """Log ``msg`` once the block completes, with its duration attached as ``duration_ms``.
+
+    Nothing is logged if the block raises.
+    """
+    start = time.perf_counter()
+    yield
+    if logger.isEnabledFor(level):
+        duration_ms = round((time.perf_counter() - start) * 1000, 3)
+        logger.log(level, msg + ' (%.1f ms)', *args, duration_ms, extra={'duration_ms': duration_ms})
@@ -1,35 +1,37 @@
 import boto3
 from botocore.exceptions import ClientError
-import json
 import logging
+from config_loader import get_config
+from journal import get_journal
 
-# Configure logging
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
-    handlers=[
-        logging.StreamHandler()
-    ]
-)
 logger = logging.getLogger(__name__)
 
-# Load configuration
-with open('/var/lib/jenkins/workspace/pip/platform-engineering/platform_engineering/config.json') as config_file:
-    config = json.load(config_file)
-
 
 class EC2Manager:
-    def __init__(self, region=None):
-        self.region = region or config.get('default_region', 'us-east-1')
+    def __init__(self, region=None, journal=None):
+        self.config = get_config()
+        self.journal = journal or get_journal()
+        self.region = region or self.config.default_region
         self.ec2 = boto3.resource('ec2', region_name=self.region)
         self.client = boto3.client('ec2', region_name=self.region)
-        self.username_tag_key = config.get('username_tag_key', 'CreatedByCLIUser')
-        self.username = config.get('username')  # Read username from config
+        self.username_tag_key = self.config.username_tag_key
+        self.username = self.config.username  # Read username from config
 
-    def create_instance(self, instance_type, ami_id, subnet_id, name):
+    def create_instance(self, instance_type, ami_id, subnet_id, name, op_key=None):
+        params = {'instance_type': instance_type, 'ami_id': ami_id, 'subnet_id': subnet_id, 'name': name}
+        key = self.journal.intend('ec2', 'create_instance', params, key=op_key, region=self.region)
         try:
-            if self._count_running_instances() >= config.get('max_running_instances', 2):
+            if op_key is not None:
+                # The key doubles as the ClientToken, so a launch that already went through can be found.
+                instance_id = self._get_instance_id_by_client_token(key)
+                if instance_id:
+                    logger.info('Instance %s was already created', instance_id)
+                    self.journal.complete(key, instance_id)
+                    return instance_id
+
+            if self._count_running_instances() >= self.config.max_running_instances:
                 logger.error('Instance limit reached.')
+                self.journal.fail(key, 'Instance limit reached.')
                 raise Exception('Instance limit reached.')
 
             instances = self.ec2.create_instances(
@@ -38,6 +40,7 @@ class EC2Manager:
                 SubnetId=subnet_id,
                 MinCount=1,
                 MaxCount=1,
+                ClientToken=key,
                 TagSpecifications=[
                     {
                         'ResourceType': 'instance',
@@ -49,43 +52,71 @@ class EC2Manager:
                 ]
             )
             instance_id = instances[0].id
-            logger.info(f'Created instance {instance_id}')
+            logger.info('Created instance %s', instance_id)
+            self.journal.complete(key, instance_id)
             return instance_id
         except ClientError as e:
-            logger.error(f'Error creating instance: {e}')
+            logger.error('Error creating instance: %s', e)
+            self.journal.fail(key, e)
             return None
 
-    def start_instance(self, name=None, instance_id=None):
+    def start_instance(self, name=None, instance_id=None, op_key=None):
         instance_id = instance_id or self.get_instance_id_by_name(name)
         if not instance_id:
-            logger.error(f'No instance found with name {name} or ID {instance_id}.')
+            logger.error('No instance found with name %s or ID %s.', name, instance_id)
+            self._fail_replay(op_key, f'No instance found with name {name} or ID {instance_id}.')
             return
 
         instance = self.ec2.Instance(instance_id)
-        if self._validate_instance(instance):
+        try:
+            owned = self._validate_instance(instance)
+        except ClientError as e:
+            logger.error('Error loading instance %s: %s', instance_id, e)
+            self._fail_replay(op_key, e)
+            return
+
+        if owned:
+            key = self.journal.intend('ec2', 'start_instance', {'instance_id': instance_id}, key=op_key,
+                                       region=self.region)
             try:
                 instance.start()
-                logger.info(f'Started instance {instance_id}')
+                logger.info('Started instance %s', instance_id)
+                self.journal.complete(key)
             except ClientError as e:
-                logger.error(f'Error starting instance {instance_id}: {e}')
+                logger.error('Error starting instance %s: %s', instance_id, e)
+                self.journal.fail(key, e)
         else:
-            logger.error(f'Instance {instance_id} does not belong to {self.username} or was not created by CLI.')
+            logger.error('Instance %s does not belong to %s or was not created by CLI.', instance_id, self.username)
+            self._fail_replay(op_key, f'Instance {instance_id} does not belong to {self.username}.')
 
-    def stop_instance(self, name=None, instance_id=None):
+    def stop_instance(self, name=None, instance_id=None, op_key=None):
         instance_id = instance_id or self.get_instance_id_by_name(name)
         if not instance_id:
-            logger.error(f'No instance found with name {name} or ID {instance_id}.')
+            logger.error('No instance found with name %s or ID %s.', name, instance_id)
+            self._fail_replay(op_key, f'No instance found with name {name} or ID {instance_id}.')
             return
 
         instance = self.ec2.Instance(instance_id)
-        if self._validate_instance(instance):
+        try:
+            owned = self._validate_instance(instance)
+        except ClientError as e:
+            logger.error('Error loading instance %s: %s', instance_id, e)
+            self._fail_replay(op_key, e)
+            return
+
+        if owned:
+            key = self.journal.intend('ec2', 'stop_instance', {'instance_id': instance_id}, key=op_key,
+                                       region=self.region)
             try:
                 instance.stop()
-                logger.info(f'Stopped instance {instance_id}')
+                logger.info('Stopped instance %s', instance_id)
+                self.journal.complete(key)
             except ClientError as e:
-                logger.error(f'Error stopping instance {instance_id}: {e}')
+                logger.error('Error stopping instance %s: %s', instance_id, e)
+                self.journal.fail(key, e)
         else:
-            logger.error(f'Instance {instance_id} does not belong to {self.username} or was not created by CLI.')
+            logger.error('Instance %s does not belong to %s or was not created by CLI.', instance_id, self.username)
+            self._fail_replay(op_key, f'Instance {instance_id} does not belong to {self.username}.')
 
     def list_instances(self):
         try:
@@ -102,10 +133,10 @@ class EC2Manager:
                     name = next((tag['Value'] for tag in instance.get('Tags', []) if tag['Key'] == 'Name'), 'Unnamed')
                     instance_details.append({'ID': instance_id, 'Name': name})
 
-            logger.info(f'Listed instances: {instance_details}')
+            logger.debug('Listed instances: %s', instance_details)
             return instance_details
         except ClientError as e:
-            logger.error(f'Error listing instances: {e}')
+            logger.error('Error listing instances: %s', e)
             return []
 
     def get_instance_id_by_name(self, name):
@@ -118,13 +149,24 @@ class EC2Manager:
             )
             instance_ids = [i['InstanceId'] for r in instances['Reservations'] for i in r['Instances']]
             if instance_ids:
-                logger.info(f'Found instance ID {instance_ids[0]} for name {name}')
+                logger.debug('Found instance ID %s for name %s', instance_ids[0], name)
                 return instance_ids[0]
             else:
-                logger.error(f'No instance found with name {name}')
+                logger.error('No instance found with name %s', name)
                 return None
         except ClientError as e:
-            logger.error(f'Error finding instance by name {name}: {e}')
+            logger.error('Error finding instance by name %s: %s', name, e)
+            return None
+
+    def _get_instance_id_by_client_token(self, client_token):
+        try:
+            instances = self.client.describe_instances(
+                Filters=[{'Name': 'client-token', 'Values': [client_token]}]
+            )
+            instance_ids = [i['InstanceId'] for r in instances['Reservations'] for i in r['Instances']]
+            return instance_ids[0] if instance_ids else None
+        except ClientError as e:
+            logger.error('Error finding instance by client token %s: %s', client_token, e)
             return None
 
     def _count_running_instances(self):
@@ -144,13 +186,18 @@ class EC2Manager:
                     if state in ['running', 'stopped']:
                         running_and_stopped_instances += 1
 
-            logger.info(f'Count of running and stopped instances: {running_and_stopped_instances}')
+            logger.debug('Count of running and stopped instances: %s', running_and_stopped_instances)
             return running_and_stopped_instances
 
         except ClientError as e:
-            logger.error(f'Error counting instances: {e}')
+            logger.error('Error counting instances: %s', e)
             return 0
 
+    def _fail_replay(self, op_key, error):
+        """Record why a resumed operation could not run; fresh calls have not journaled an intent yet."""
+        if op_key is not None:
+            self.journal.fail(op_key, error)
+
     def _validate_instance(self, instance):
         """Check if the instance exists and has the correct user tag."""
         tags = instance.tags or []
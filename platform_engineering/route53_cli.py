@@ -1,26 +1,33 @@
 import click
 import logging
 from route53_manager import Route53Manager
+from log_setup import LOG_LEVELS, setup_logging
+from config_loader import CONFIG_ENV_VAR, load_config
 
-# Configure logging
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
-    handlers=[logging.StreamHandler()]
-)
 logger = logging.getLogger(__name__)
 
 
 @click.group()
-def cli():
+@click.option('--config', 'config_path', type=click.Path(dir_okay=False), envvar=CONFIG_ENV_VAR,
+              help='Path to config.json (default: the one next to this CLI).')
+@click.option('--log-level', type=click.Choice(LOG_LEVELS, case_sensitive=False), default='INFO',
+              help='Minimum level of log records to emit.')
+@click.option('--quiet', is_flag=True, help='Only emit errors.')
+@click.option('--json-logs', is_flag=True, help='Emit log records as JSON lines.')
+@click.option('--aws-debug', is_flag=True, help='Also emit boto3/botocore records below WARNING.')
+def cli(config_path, log_level, quiet, json_logs, aws_debug):
     """Main CLI command."""
-    pass
+    setup_logging(level=log_level, quiet=quiet, json_format=json_logs, aws_debug=aws_debug)
+    try:
+        load_config(config_path)
+    except (OSError, ValueError) as e:
+        raise click.ClickException(f'Invalid configuration: {e}')
 
 
 @cli.group()
 def route53():
     """Route53 management commands."""
-    logger.info("Route53 command registered")
+    logger.debug("Route53 command registered")
 
 
 @route53.command(name='create-zone')
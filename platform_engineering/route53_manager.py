@@ -1,26 +1,14 @@
 import boto3
-import uuid
+from botocore.exceptions import ClientError
 import json
 import logging
 import re
 import os
+from config_loader import get_config
+from journal import get_journal
 
-# Configure logging
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
-    handlers=[logging.StreamHandler()]
-)
 logger = logging.getLogger(__name__)
 
-# Load configuration
-with open('config.json') as f:
-    config = json.load(f)
-
-default_region = config['default_region']
-created_by = config['username']
-default_vpc_id = config['default_vpc_id']
-
 
 def is_valid_ip(ip):
     """Validate an IPv4 address."""
@@ -29,16 +17,15 @@ def is_valid_ip(ip):
 
 
 class Route53Manager:
-    def __init__(self):
+    def __init__(self, journal=None):
+        self.journal = journal or get_journal()
         self.zones_file = 'created_zones.json'
         self.created_zones = self.load_zones()
 
-        # Load configuration
-        with open('config.json') as config_file:
-            config = json.load(config_file)
-            self.region = config.get('default_region', 'us-east-1')
-            self.username = config.get('username', 'unknown')
-            self.default_vpc_id = config.get('default_vpc_id', None)
+        config = get_config()
+        self.region = config.default_region
+        self.username = config.username
+        self.default_vpc_id = config.default_vpc_id
 
         # Initialize the Route 53 client
         self.client = boto3.client('route53')
@@ -53,10 +40,12 @@ class Route53Manager:
         with open(self.zones_file, 'w') as f:
             json.dump(self.created_zones, f)
 
-    def create_zone(self, name, zone_type, vpc_id=None):
+    def create_zone(self, name, zone_type, vpc_id=None, op_key=None):
+        key = self.journal.intend('route53', 'create_zone',
+                                  {'name': name, 'zone_type': zone_type, 'vpc_id': vpc_id}, key=op_key)
         kwargs = {
             'Name': name,
-            'CallerReference': str(uuid.uuid4()),
+            'CallerReference': key,
             'HostedZoneConfig': {
                 'Comment': f'Created by {self.username}',
                 'PrivateZone': zone_type == 'private'
@@ -69,16 +58,36 @@ class Route53Manager:
                 'VPCRegion': self.region
             }
 
-        response = self.client.create_hosted_zone(**kwargs)
-        zone_id = response['HostedZone']['Id']
-        self.created_zones.append({'Id': zone_id, 'Name': name})
-        self.save_zones()  # Persist changes
-        logger.info(f"Zone created: {name} with ID: {zone_id}")  # Logging
+        try:
+            try:
+                response = self.client.create_hosted_zone(**kwargs)
+                zone_id = response['HostedZone']['Id']
+            except self.client.exceptions.HostedZoneAlreadyExists:
+                # The journal key is the CallerReference, so a zone from an earlier attempt can be recognised.
+                zone_id = self._get_zone_id_by_caller_reference(name, key) if op_key else None
+                if zone_id is None:
+                    raise
+        except ClientError as e:
+            self.journal.fail(key, e)
+            raise
+
+        if not any(zone['Id'] == zone_id for zone in self.created_zones):
+            self.created_zones.append({'Id': zone_id, 'Name': name})
+            self.save_zones()  # Persist changes
+        self.journal.complete(key, zone_id)
+        logger.info("Zone created: %s with ID: %s", name, zone_id)  # Logging
         return zone_id
 
+    def _get_zone_id_by_caller_reference(self, name, caller_reference):
+        response = self.client.list_hosted_zones_by_name(DNSName=name)
+        for zone in response['HostedZones']:
+            if zone.get('CallerReference') == caller_reference:
+                return zone['Id']
+        return None
+
     def list_zones(self):
         """List zones created by this user."""
-        logger.info("Listing created zones.")
+        logger.debug("Listing created zones.")
         return [{"Name": zone['Name'], "Id": zone['Id']} for zone in self.created_zones]
 
     def get_zone_id_by_name(self, zone_name):
@@ -87,10 +96,14 @@ class Route53Manager:
                 return zone['Id']
         return None
 
-    def create_record(self, zone_id, record_name, record_type, record_value):
+    def create_record(self, zone_id, record_name, record_type, record_value, op_key=None):
         if not any(zone['Id'] == zone_id for zone in self.created_zones):
             raise ValueError(f"Zone ID {zone_id} is not allowed. It must be created by you via the CLI.")
 
+        params = {'zone_id': zone_id, 'record_name': record_name, 'record_type': record_type,
+                  'record_value': record_value}
+        key = self.journal.intend('route53', 'create_record', params, key=op_key)
+
         record_set = {
             'Name': record_name,
             'Type': record_type,
@@ -98,22 +111,38 @@ class Route53Manager:
             'ResourceRecords': [{'Value': record_value}]
         }
 
-        response = self.client.change_resource_record_sets(
-            HostedZoneId=zone_id,
-            ChangeBatch={
-                'Changes': [{
-                    'Action': 'CREATE',
-                    'ResourceRecordSet': record_set
-                }]
-            }
-        )
-
+        try:
+            response = self.client.change_resource_record_sets(
+                HostedZoneId=zone_id,
+                ChangeBatch={
+                    'Changes': [{
+                        'Action': 'CREATE',
+                        'ResourceRecordSet': record_set
+                    }]
+                }
+            )
+        except self.client.exceptions.InvalidChangeBatch as e:
+            # On resume the earlier attempt may already have created it; accept only an exact match
+            # so a record that existed beforehand is never overwritten.
+            if op_key is not None and self._record_matches(zone_id, record_name, record_type, record_value):
+                logger.info("Record %s of type %s was already created", record_name, record_type)
+                self.journal.complete(key)
+                return None
+            self.journal.fail(key, e)
+            raise
+        except ClientError as e:
+            self.journal.fail(key, e)
+            raise
+
+        self.journal.complete(key, response['ChangeInfo']['Id'])
         return response
 
-    def update_record(self, zone_id, record_name, record_type, new_value, new_ttl):
+    def update_record(self, zone_id, record_name, record_type, new_value, new_ttl, op_key=None):
         # Check if the zone_id is in the created_zones list
         if not any(zone['Id'] == zone_id for zone in self.created_zones):
-            logger.error(f"Zone ID {zone_id} is not managed by this CLI.")
+            logger.error("Zone ID %s is not managed by this CLI.", zone_id)
+            if op_key is not None:
+                self.journal.fail(op_key, f"Zone ID {zone_id} is not managed by this CLI.")
             return False
 
         change_batch = {
@@ -130,22 +159,54 @@ class Route53Manager:
             ]
         }
 
-        response = self.client.change_resource_record_sets(
-            HostedZoneId=zone_id,
-            ChangeBatch=change_batch
-        )
-
+        params = {'zone_id': zone_id, 'record_name': record_name, 'record_type': record_type,
+                  'new_value': new_value, 'new_ttl': new_ttl}
+        key = self.journal.intend('route53', 'update_record', params, key=op_key)
+        try:
+            response = self.client.change_resource_record_sets(
+                HostedZoneId=zone_id,
+                ChangeBatch=change_batch
+            )
+        except ClientError as e:
+            self.journal.fail(key, e)
+            raise
+
+        self.journal.complete(key, response['ChangeInfo']['Id'])
         return response['ChangeInfo']['Status'] == 'PENDING'
 
+    def _get_record(self, zone_id, record_name, record_type):
+        """Return the live record set, False if it does not exist, or None if the lookup failed."""
+        try:
+            response = self.client.list_resource_record_sets(
+                HostedZoneId=zone_id,
+                StartRecordName=record_name,
+                StartRecordType=record_type,
+                MaxItems='1'
+            )
+        except ClientError as e:
+            logger.error("Error looking up record %s of type %s: %s", record_name, record_type, e)
+            return None
+        records = response['ResourceRecordSets']
+        if records and records[0]['Type'] == record_type and \
+                records[0]['Name'].rstrip('.').lower() == record_name.rstrip('.').lower():
+            return records[0]
+        return False
+
+    def _record_matches(self, zone_id, record_name, record_type, record_value):
+        record = self._get_record(zone_id, record_name, record_type)
+        return bool(record) and [r['Value'] for r in record.get('ResourceRecords', [])] == [record_value]
+
     def list_records(self, zone_id):
         """List all records in a given hosted zone."""
         response = self.client.list_resource_record_sets(HostedZoneId=zone_id)
         return response['ResourceRecordSets']
 
-    def delete_record(self, zone_id, record_name, record_type, record_value):
+    def delete_record(self, zone_id, record_name, record_type, record_value, op_key=None):
         # Check if the zone ID is in the list of managed zones
         if not any(zone['Id'] == zone_id for zone in self.created_zones):
-            logger.error(f"Zone ID {zone_id} is not managed by this CLI.")
+            logger.error("Zone ID %s is not managed by this CLI.", zone_id)
+            if op_key is not None:
+                self.journal.fail(op_key, f"Zone ID {zone_id} is not managed by this CLI.")
             return False
 
         # Prepare the resource record set for deletion
@@ -163,9 +224,26 @@ class Route53Manager:
             ]
         }
 
-        response = self.client.change_resource_record_sets(
-            HostedZoneId=zone_id,
-            ChangeBatch=change_batch
-        )
-
+        params = {'zone_id': zone_id, 'record_name': record_name, 'record_type': record_type,
+                  'record_value': record_value}
+        key = self.journal.intend('route53', 'delete_record', params, key=op_key)
+        try:
+            response = self.client.change_resource_record_sets(
+                HostedZoneId=zone_id,
+                ChangeBatch=change_batch
+            )
+        except self.client.exceptions.InvalidChangeBatch as e:
+            # InvalidChangeBatch also covers a DELETE that does not match the live record, so on
+            # resume only treat it as done once the record is confirmed to be gone.
+            if op_key is not None and self._get_record(zone_id, record_name, record_type) is False:
+                logger.info("Record %s of type %s was already deleted", record_name, record_type)
+                self.journal.complete(key)
+                return True
+            self.journal.fail(key, e)
+            raise
+        except ClientError as e:
+            self.journal.fail(key, e)
+            raise
+
+        self.journal.complete(key, response['ChangeInfo']['Id'])
         return response['ChangeInfo']['Status'] == 'PENDING'
@@ -1,53 +1,140 @@
 import boto3
+import heapq
 import logging
-from botocore.exceptions import ClientError
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from botocore.exceptions import BotoCoreError, ClientError
+from boto3.exceptions import S3UploadFailedError
 import json
+from log_setup import log_timing
+from config_loader import get_config
+from journal import get_journal
+
+# Object metadata key carrying the journal key of the upload that wrote it.
+JOURNAL_METADATA_KEY = 'journal-key'
 
-# Configure logging
-logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-# Load configuration
-with open('config.json') as config_file:
-    config = json.load(config_file)
+
+class BucketUsage:
+    """Streaming, constant-memory accumulator of one bucket's object statistics."""
+
+    def __init__(self, bucket, top_prefixes=3):
+        self.bucket = bucket
+        self.objects = 0
+        self.total_bytes = 0
+        self.storage_classes = {}
+        self.largest_prefixes = []
+        self.truncated = False
+        self.error = None
+        self.elapsed = 0.0
+        self._top_prefixes = top_prefixes
+        self._heap = []  # min-heap of (bytes, prefix) holding the largest prefixes seen so far
+        self._prefix = None
+        self._prefix_bytes = 0
+        self._root_bytes = 0
+
+    def add(self, obj):
+        size = obj.get('Size', 0)
+        self.objects += 1
+        self.total_bytes += size
+
+        storage_class = obj.get('StorageClass', 'STANDARD')
+        stats = self.storage_classes.setdefault(storage_class, {'objects': 0, 'bytes': 0})
+        stats['objects'] += 1
+        stats['bytes'] += size
+
+        key = obj['Key']
+        if '/' not in key:
+            self._root_bytes += size
+            return
+        # Listings are in key order, so every key under one top-level prefix arrives in a single run.
+        prefix = key.split('/', 1)[0] + '/'
+        if prefix != self._prefix:
+            self._push_prefix()
+            self._prefix = prefix
+        self._prefix_bytes += size
+
+    def _push_prefix(self):
+        if self._prefix is None or self._top_prefixes <= 0:
+            return
+        entry = (self._prefix_bytes, self._prefix)
+        if len(self._heap) < self._top_prefixes:
+            heapq.heappush(self._heap, entry)
+        elif entry > self._heap[0]:
+            heapq.heapreplace(self._heap, entry)
+        self._prefix = None
+        self._prefix_bytes = 0
+
+    def finish(self):
+        self._push_prefix()
+        if self._root_bytes:
+            self._prefix, self._prefix_bytes = '/', self._root_bytes
+            self._push_prefix()
+        self.largest_prefixes = [{'prefix': prefix, 'bytes': size}
+                                 for size, prefix in sorted(self._heap, reverse=True)]
+
+    def to_dict(self):
+        return {
+            'bucket': self.bucket,
+            'objects': self.objects,
+            'bytes': self.total_bytes,
+            'storage_classes': self.storage_classes,
+            'largest_prefixes': self.largest_prefixes,
+            'truncated': self.truncated,
+            'error': self.error,
+            'elapsed_seconds': round(self.elapsed, 3),
+        }
 
 
 class S3Manager:
-    def __init__(self, region):
+    def __init__(self, region, journal=None):
         self.region = region
+        self.config = get_config()
+        self.journal = journal or get_journal()
         self.s3 = boto3.client('s3', region_name=region)
-        logger.info(f"S3 Manager initialized for region: {region}")
+        logger.debug("S3 Manager initialized for region: %s", region)
 
-    def create_bucket(self, name, public=False, user=None):
+    def create_bucket(self, name, public=False, user=None, op_key=None):
+        key = self.journal.intend('s3', 'create_bucket', {'name': name, 'public': public, 'user': user},
+                                  key=op_key, region=self.region)
         try:
             # Create bucket with region configuration
-            if self.region == 'us-east-1':
-                response = self.s3.create_bucket(Bucket=name)
-            else:
-                response = self.s3.create_bucket(
-                    Bucket=name,
-                    CreateBucketConfiguration={
-                        'LocationConstraint': self.region
-                    }
-                )
+            try:
+                if self.region == 'us-east-1':
+                    response = self.s3.create_bucket(Bucket=name)
+                else:
+                    response = self.s3.create_bucket(
+                        Bucket=name,
+                        CreateBucketConfiguration={
+                            'LocationConstraint': self.region
+                        }
+                    )
+            except self.s3.exceptions.BucketAlreadyOwnedByYou:
+                # A resumed run may find the bucket from its first attempt; finish the setup
+                # only if nothing marks it as created by someone else.
+                if op_key is None or self._bucket_tags(name).get('CreatedBy', user) != user:
+                    raise
 
             if public:
                 self.make_bucket_public(name)
 
-            # Tag the bucket
+            # Tag the bucket, keeping any tags it already has
+            tags = self._bucket_tags(name)
+            tags['CreatedBy'] = user
             self.s3.put_bucket_tagging(
                 Bucket=name,
                 Tagging={
-                    'TagSet': [
-                        {'Key': 'CreatedBy', 'Value': user}
-                    ]
+                    'TagSet': [{'Key': tag_key, 'Value': value} for tag_key, value in tags.items()]
                 }
             )
 
-            logger.info(f"Bucket created: {name}")
+            logger.info("Bucket created: %s", name)
+            self.journal.complete(key, name)
             return name
         except ClientError as e:
-            logger.error(f"Error creating bucket: {e}")
+            logger.error("Error creating bucket: %s", e)
+            self.journal.fail(key, e)
             return None
 
     def make_bucket_public(self, name):
@@ -65,34 +152,87 @@ class S3Manager:
         }
         policy_string = json.dumps(bucket_policy)
         self.s3.put_bucket_policy(Bucket=name, Policy=policy_string)
-        logger.info(f"Bucket {name} is now public")
-
-    def list_buckets(self):
-        buckets = self.s3.list_buckets().get('Buckets', [])
-        user_tagged_buckets = []
+        logger.info("Bucket %s is now public", name)
 
-        for bucket in buckets:
-            bucket_name = bucket['Name']
-            try:
-                tags = self.s3.get_bucket_tagging(Bucket=bucket_name).get('TagSet', [])
-                tags_dict = {tag['Key']: tag['Value'] for tag in tags}
-                if tags_dict.get('CreatedBy') == config['username']:
-                    user_tagged_buckets.append(bucket_name)
-            except ClientError:
-                # Ignore buckets that do not have tags
-                continue
+    def list_buckets(self, workers=8):
+        with log_timing(logger, 'Scanned bucket tags', level=logging.DEBUG):
+            bucket_names = [bucket['Name'] for bucket in self.s3.list_buckets().get('Buckets', [])]
+            with ThreadPoolExecutor(max_workers=workers) as executor:
+                owned = executor.map(self._is_user_bucket, bucket_names)
+                user_tagged_buckets = [name for name, mine in zip(bucket_names, owned) if mine]
 
         return user_tagged_buckets
 
-    def upload_file(self, bucket_name, file_path, object_name=None):
+    def _bucket_tags(self, bucket_name):
+        try:
+            tags = self.s3.get_bucket_tagging(Bucket=bucket_name).get('TagSet', [])
+        except ClientError:
+            # Buckets without tags raise NoSuchTagSet
+            return {}
+        return {tag['Key']: tag['Value'] for tag in tags}
+
+    def _is_user_bucket(self, bucket_name):
+        return self._bucket_tags(bucket_name).get('CreatedBy') == self.config.username
+
+    def bucket_usage(self, bucket_name, time_budget=None, top_prefixes=3):
+        """Aggregate object statistics for a bucket, page by page.
+
+        Listing stops after ``time_budget`` seconds and the result is marked truncated.
+        """
+        usage = BucketUsage(bucket_name, top_prefixes)
+        start = time.monotonic()
+        paginator = self.s3.get_paginator('list_objects_v2')
+        try:
+            for page in paginator.paginate(Bucket=bucket_name):
+                for obj in page.get('Contents', []):
+                    usage.add(obj)
+                if page.get('IsTruncated') and time_budget and time.monotonic() - start >= time_budget:
+                    usage.truncated = True
+                    logger.warning("Time budget of %ss exhausted for bucket %s after %s objects",
+                                   time_budget, bucket_name, usage.objects)
+                    break
+        except (ClientError, BotoCoreError) as e:
+            logger.error("Error listing bucket %s: %s", bucket_name, e)
+            usage.error = str(e)
+        usage.elapsed = time.monotonic() - start
+        usage.finish()
+        return usage
+
+    def usage_report(self, bucket_names, workers=8, time_budget=None, top_prefixes=3):
+        """Yield a BucketUsage per bucket as each concurrent listing finishes."""
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            futures = [executor.submit(self.bucket_usage, name, time_budget, top_prefixes)
+                       for name in bucket_names]
+            for future in as_completed(futures):
+                yield future.result()
+
+    def upload_file(self, bucket_name, file_path, object_name=None, op_key=None):
         """Upload a file to an S3 bucket"""
         if object_name is None:
             object_name = file_path
 
+        params = {'bucket_name': bucket_name, 'file_path': file_path, 'object_name': object_name}
+        key = self.journal.intend('s3', 'upload_file', params, key=op_key, region=self.region)
         try:
-            self.s3.upload_file(file_path, bucket_name, object_name)
-            logger.info(f"File {file_path} uploaded to bucket {bucket_name} as {object_name}")
+            if op_key is not None and self._uploaded_with_key(bucket_name, object_name, key):
+                logger.info("File %s was already uploaded to bucket %s as %s", file_path, bucket_name, object_name)
+                self.journal.complete(key)
+                return True
+
+            with log_timing(logger, "File %s uploaded to bucket %s as %s", file_path, bucket_name, object_name):
+                self.s3.upload_file(file_path, bucket_name, object_name,
+                                    ExtraArgs={'Metadata': {JOURNAL_METADATA_KEY: key}})
+            self.journal.complete(key)
             return True
-        except ClientError as e:
-            logger.error(f"Failed to upload file: {e}")
+        except (ClientError, S3UploadFailedError, OSError) as e:
+            logger.error("Failed to upload file: %s", e)
+            self.journal.fail(key, e)
+            return False
+
+    def _uploaded_with_key(self, bucket_name, object_name, key):
+        """Check whether the object was written by the upload identified by ``key``."""
+        try:
+            head = self.s3.head_object(Bucket=bucket_name, Key=object_name)
+        except ClientError:
             return False
+        return head.get('Metadata', {}).get(JOURNAL_METADATA_KEY) == key